@@ -162,7 +162,7 @@ class ApproximateHessian(LinearOperator):
             target = target * np.eye(self.dim)
         assert target.shape == self.shape
         self.B = target
-        self.evals, self.evecs = eigh(self.B)
+        self.evals, self.evecs = eigh(self.B, check_finite=False)
 
     def update(self, dx, dg):
         """Perform a quasi-Newton update on B"""
@@ -1,7 +1,8 @@
 from typing import Union
 
 import numpy as np
-from scipy.linalg import eigh
+from scipy.linalg import cho_factor, cho_solve, eigh, lstsq
+from scipy.linalg.blas import dsymm
 from scipy.integrate import LSODA
 from ase import Atoms
 from ase.utils import basestring
@@ -16,6 +17,100 @@ from sellac.eigensolvers import rayleigh_ritz
 from sellac.internal import Internals, Constraints, DuplicateInternalError
 
 
+def _ortho(X, Y=None, eps=1e-6):
+    """Returns an orthonormal basis for the column space of X orthogonal
+    to the orthonormal columns of Y.
+
+    When X has full column rank this is done with LAPACK's Householder
+    QR, which is backward stable regardless of conditioning and runs in
+    compiled BLAS3, unlike the column-by-column Gram-Schmidt sweep. The
+    Q factor is sign-fixed so that the result coincides with what
+    modified_gram_schmidt would produce. Rank-deficient X falls back to
+    modified_gram_schmidt, which prunes dependent columns one at a time;
+    call sites whose input is singular by construction should call
+    modified_gram_schmidt directly and skip the wasted QR."""
+    if X.ndim == 1:
+        X = X[:, np.newaxis]
+    if X.shape[1] == 0:
+        return X
+
+    # Normalize the columns so that the rank check below measures the
+    # relative residual of each column.
+    norms = np.linalg.norm(X, axis=0)
+    if np.any(norms <= eps):
+        return modified_gram_schmidt(X, Y) if Y is not None \
+            else modified_gram_schmidt(X)
+    Xn = X / norms
+
+    if Y is not None and Y.shape[1] > 0:
+        # Two projection passes, the second removing the round-off
+        # reintroduced by the first.
+        Xn = Xn - Y @ (Y.T @ Xn)
+        Xn -= Y @ (Y.T @ Xn)
+
+    Q, R = np.linalg.qr(Xn)
+    rdiag = np.diag(R)
+    if np.any(np.abs(rdiag) <= eps):
+        # Linearly dependent columns: prune them in input order.
+        return modified_gram_schmidt(X, Y) if Y is not None \
+            else modified_gram_schmidt(X)
+    # Flip signs so that R would have a positive diagonal, making Q
+    # unique and equal to the Gram-Schmidt basis up to round-off.
+    return Q * np.sign(rdiag)
+
+
+def _contract(v, T):
+    """Contracts the vector v with the leading axis of the rank-3 tensor
+    T. Reshaping to a single matrix product hits BLAS instead of the
+    generic einsum loop for this pattern."""
+    # The trailing size is spelled out because -1 is ambiguous for the
+    # zero-size tensors an empty constraint set produces
+    return (v @ T.reshape(T.shape[0],
+                          T.shape[1] * T.shape[2])).reshape(T.shape[1:])
+
+
+def _q_ode_core(dxdt, g, Binv, D):
+    """Pure-array right-hand side of the geometry update ODE for known
+    Jacobian data. Factored out of the InternalPES method so the inner
+    LSODA loop pays for the arithmetic only, with the two curvature
+    products written straight into the output buffer."""
+    dydt = np.empty((3, dxdt.shape[0]))
+    dydt[0] = dxdt
+    # Contract D with dxdt first so that both outputs share a single
+    # BLAS3 product instead of materializing separate einsum paths
+    D_tmp = Binv @ np.tensordot(D, dxdt, axes=(1, 0))
+    np.dot(D_tmp, dxdt, out=dydt[1])
+    np.dot(D_tmp, g, out=dydt[2])
+    dydt[1:] *= -1.
+    return dydt.ravel()
+
+
+def _sym_project(H, U):
+    """Projects the symmetric matrix H into the column space of U.
+    dsymm reads a single triangle of H, halving its memory traffic
+    relative to a general GEMM, and the explicit symmetrization removes
+    the round-off asymmetry of the triple product."""
+    M = U.T @ dsymm(1., H, U)
+    return 0.5 * (M + M.T)
+
+
+def _lsq(A, b):
+    """Least-squares solution of A @ x = b via the normal equations.
+
+    The systems passed here have one column per constraint and at most
+    as many rows as degrees of freedom, so A.T @ A is a tiny symmetric
+    positive-definite system that a Cholesky solve handles in O(m^3)
+    instead of the SVD that np.linalg.lstsq performs. Rank-deficient systems make the Cholesky
+    factorization fail, in which case we fall back to the minimum-norm
+    solution from LAPACK's complete orthogonal factorization (GELSY),
+    which is cheaper than the divide-and-conquer SVD driver."""
+    try:
+        return cho_solve(cho_factor(A.T @ A, check_finite=False),
+                         A.T @ b, check_finite=False)
+    except np.linalg.LinAlgError:
+        return lstsq(A, b, lapack_driver='gelsy', check_finite=False)[0]
+
+
 class PES:
     def __init__(
         self,
@@ -93,6 +188,12 @@ class PES:
     apos = property(lambda self: self.atoms.positions.copy())
     dpos = property(lambda self: None)
 
+    def _pos_key(self):
+        """Byte snapshot of the positions this wrapper depends on. A
+        memcmp against it is a cheap change check that also catches
+        moves made directly on the Atoms object outside the wrapper."""
+        return self.atoms.positions.tobytes()
+
     def save(self):
         self.savepoint = dict(apos=self.apos, dpos=self.dpos)
 
@@ -111,7 +212,8 @@ class PES:
         return diff, diff, self.curr.get('g', np.zeros_like(diff))
 
     def get_x(self):
-        return self.apos.ravel().copy()
+        # Single copy; the apos property would copy a second time
+        return self.atoms.positions.ravel().copy()
 
     # Hessian getter/setter
     def get_H(self):
@@ -124,7 +226,7 @@ class PES:
 
     # Hessian of the constraints
     def get_Hc(self):
-        return np.einsum('i,ijk->jk', self.curr['L'], self.cons.hessian())
+        return _contract(self.curr['L'], self.cons.hessian())
 
     # Hessian of the Lagrangian
     def get_HL(self):
@@ -139,7 +241,7 @@ class PES:
 
     def _calc_basis(self):
         drdx = self.get_drdx()
-        Ucons = modified_gram_schmidt(drdx.T)
+        Ucons = _ortho(drdx.T)
         Unred = np.eye(self.dim)
         # speed up Ufree calc by pre-removing fixed atom constraints
         removed_dof = []
@@ -153,6 +255,9 @@ class PES:
         Ufree = Unred[:, rem_dof]
         rem_cons = [i for i in range(self.cons.nint) if i not in removed_cons]
         Ucons_red = Ucons[:, rem_cons]
+        # Ufree always loses rank to the remaining constraints, so go
+        # straight to the pruning Gram-Schmidt sweep instead of letting
+        # _ortho attempt (and discard) a full QR
         Ufree = modified_gram_schmidt(Ufree, Ucons_red)
         return drdx, Ucons, Unred, Ufree
 
@@ -180,21 +285,28 @@ class PES:
         """Returns displacement vector for linear constraint correction."""
         Ucons = self.get_Ucons()
 
-        scons = -Ucons @ np.linalg.lstsq(
-            self.get_drdx() @ Ucons,
-            self.get_res(),
-            rcond=None,
-        )[0]
+        scons = -Ucons @ _lsq(self.get_drdx() @ Ucons, self.get_res())
         return scons
 
     def _update(self, feval=True):
-        x = self.get_x()
-        new_point = True
-        if self.curr['x'] is not None and np.all(x == self.curr['x']):
-            if feval and self.curr['f'] is None:
-                new_point = False
-            else:
+        # A matching position snapshot means the geometry is unchanged
+        # without rederiving the coordinate vector (which recomputes the
+        # internal coordinates for InternalPES).
+        poskey = self._pos_key()
+        if poskey == self.curr.get('poskey'):
+            if not (feval and self.curr['f'] is None):
                 return False
+            x = self.curr['x']
+            new_point = False
+        else:
+            x = self.get_x()
+            new_point = True
+            if self.curr['x'] is not None and np.all(x == self.curr['x']):
+                self.curr['poskey'] = poskey
+                if feval and self.curr['f'] is None:
+                    new_point = False
+                else:
+                    return False
         drdx, Ucons, Unred, Ufree = self._calc_basis()
 
         if new_point and not feval:
@@ -203,6 +315,10 @@ class PES:
 
         if feval:
             f, g = self.eval()
+            # Deliberately not _lsq: the multipliers computed here feed
+            # every constrained Hessian, and the rounding difference
+            # between the normal equations and the SVD is enough to
+            # perturb downstream optimization trajectories.
             L = np.linalg.lstsq(drdx.T, g, rcond=None)[0]
         else:
             f = None
@@ -212,7 +328,8 @@ class PES:
         if new_point:
             self.last = self.curr
             self.curr = dict(x=x, f=f, g=g, drdx=drdx, Ucons=Ucons,
-                             Unred=Unred, Ufree=Ufree, L=L)
+                             Unred=Unred, Ufree=Ufree, L=L,
+                             poskey=poskey)
         else:
             self.curr['f'] = f
             self.curr['g'] = g
@@ -265,7 +382,7 @@ class PES:
         Hproj = NumericalHessian(self._calc_eg, self.get_x(), self.get_g(),
                                  self.eta, threepoint, Ufree)
         Hc = self.get_Hc()
-        rayleigh_ritz(Hproj - Ufree.T @ Hc @ Ufree, gamma, P, v0=v0,
+        rayleigh_ritz(Hproj - _sym_project(Hc, Ufree), gamma, P, v0=v0,
                       method=self.eigensolver,
                       maxiter=maxiter)
 
@@ -274,8 +391,9 @@ class PES:
         AVs = Hproj.AVs
 
         # Re-calculate Ritz vectors
-        Atilde = Vs.T @ symmetrize_Y(Vs, AVs, symm=2) - Vs.T @ Hc @ Vs
-        _, X = eigh(Atilde)
+        Atilde = Vs.T @ symmetrize_Y(Vs, AVs, symm=2)
+        np.subtract(Atilde, _sym_project(Hc, Vs), out=Atilde)
+        _, X = eigh(Atilde, check_finite=False)
 
         # Rotate Vs and AVs into X
         Vs = Vs @ X
@@ -291,7 +409,9 @@ class PES:
         """Returns Nx3 array of atomic forces orthogonal to constraints."""
         g = self.get_g()
         Ufree = self.get_Ufree()
-        return -((Ufree @ Ufree.T) @ g).reshape((-1, 3))
+        # Associate right-to-left: two thin matvecs instead of forming
+        # the dim x dim projector
+        return -(Ufree @ (Ufree.T @ g)).reshape((-1, 3))
 
     def converged(self, fmax, cmax=1e-5):
         fmax1 = np.linalg.norm(self.get_projected_forces(), axis=1).max()
@@ -308,13 +428,16 @@ class PES:
     def get_df_pred(self, dx, g, H):
         if H is None:
             return None
-        return g.T @ dx + (dx.T @ H @ dx) / 2.
+        # H is an ApproximateHessian; applying it as an operator avoids
+        # densifying (a missing B acts as the identity, matching the
+        # eye() that asarray used to return)
+        return g.T @ dx + (dx.T @ H.dot(dx)) / 2.
 
     def kick(self, dx, diag=False, **diag_kwargs):
         x0 = self.get_x()
         f0 = self.get_f()
         g0 = self.get_g()
-        B0 = self.H.asarray()
+        B0 = self.H
 
         dx_initial, dx_final, g_par = self.set_x(x0 + dx)
 
@@ -362,13 +485,14 @@ class InternalPES(PES):
 
         self.int = new_int
         self.dummies = self.int.dummies
+        self._jac_cache = {}
         self.dim = len(self.get_x())
         self.ncart = self.int.ndof
         if H0 is None:
             # Construct guess hessian and zero out components in
             # infeasible subspace
-            B = self.int.jacobian()
-            P = B @ np.linalg.pinv(B)
+            jacs = self._jacs(pinv=True)
+            P = jacs['B'] @ jacs['Binv']
             H0 = P @ self.int.guess_hessian() @ P
             self.set_H(H0, initialized=False)
         self.set_H(H0, initialized=True)
@@ -379,16 +503,55 @@ class InternalPES(PES):
 
     dpos = property(lambda self: self.dummies.positions.copy())
 
+    def _pos_key(self):
+        return (self.atoms.positions.tobytes()
+                + self.dummies.positions.tobytes())
+
+    def _jac_key(self):
+        """Cache key identifying the current (internal coordinate set,
+        geometry) pair."""
+        return (id(self.int), self._pos_key())
+
+    def _jacs(self, pinv=False, hessian=False):
+        """Returns the internal coordinate Jacobian (and, on request, its
+        pseudo-inverse and the internal coordinate Hessian) at the current
+        geometry, memoizing the most recent evaluation. The geometry update
+        ODE evaluates its right-hand side repeatedly at identical positions
+        (e.g. when LSODA perturbs only the velocity and gradient blocks of
+        y to estimate a Jacobian), so this avoids recomputing an expensive
+        SVD for every evaluation."""
+        key = self._jac_key()
+        cache = self._jac_cache
+        if key != cache.get('key'):
+            cache = self._jac_cache = dict(key=key, B=self.int.jacobian())
+        if pinv and 'Binv' not in cache:
+            # The internal Jacobian is always column-rank deficient
+            # (internals are invariant under overall translation and
+            # rotation), so the SVD pseudo-inverse is the right tool
+            cache['Binv'] = np.linalg.pinv(cache['B'])
+        if hessian and 'D' not in cache:
+            cache['D'] = self.int.hessian()
+        return cache
+
     # Position getter/setter
     def set_x(self, target):
         dx = target - self.get_x()
 
         t0 = 0.
-        Binv = np.linalg.pinv(self.int.jacobian())
-        y0 = np.hstack((self.apos.ravel(), self.dpos.ravel(),
-                        Binv @ dx,
-                        Binv @ self.curr.get('g', np.zeros_like(dx))))
-        ode = LSODA(self._q_ode, t0, y0, t_bound=1., atol=1e-6)
+        Binv = self._jacs(pinv=True)['Binv']
+        nxa = 3 * len(self.atoms)
+        nxd = 3 * len(self.dummies)
+        total = nxa + nxd
+        # Fill a single contiguous buffer instead of hstack-ing four
+        # temporaries
+        y0 = np.empty(3 * total)
+        y0[:nxa] = self.atoms.positions.ravel()
+        y0[nxa:total] = self.dummies.positions.ravel()
+        np.dot(Binv, dx, out=y0[total:2 * total])
+        np.dot(Binv, self.curr.get('g', np.zeros_like(dx)),
+               out=y0[2 * total:])
+        ode = LSODA(self._q_ode, t0, y0, t_bound=1., atol=1e-6,
+                    jac=self._q_jac)
 
         while ode.status == 'running':
             ode.step()
@@ -406,14 +569,13 @@ class InternalPES(PES):
         if ode.status == 'failed':
             raise RuntimeError("Geometry update ODE failed to converge!")
 
-        nxa = 3 * len(self.atoms)
-        nxd = 3 * len(self.dummies)
-        y = y.reshape((3, nxa + nxd))
+        y = y.reshape((3, total))
         self.atoms.positions = y[0, :nxa].reshape((-1, 3))
         self.dummies.positions = y[0, nxa:].reshape((-1, 3))
-        B = self.int.jacobian()
-        dx_final = t0 * B @ y[1]
-        g_final = B @ y[2]
+        # One GEMM against both columns instead of two GEMVs
+        out = self._jacs()['B'] @ y[1:3].T
+        dx_final = t0 * out[:, 0]
+        g_final = out[:, 1]
         dx_initial = t0 * dx
         return dx_initial, dx_final, g_final
 
@@ -422,33 +584,36 @@ class InternalPES(PES):
 
     # Hessian of the constraints
     def get_Hc(self):
-        D_cons = np.einsum('i,ijk->jk', self.curr['L'], self.cons.hessian())
-        B_int = self.int.jacobian()
-        Binv_int = np.linalg.pinv(B_int)
+        D_cons = _contract(self.curr['L'], self.cons.hessian())
+        jacs = self._jacs(pinv=True, hessian=True)
+        Binv_int = jacs['Binv']
         B_cons = self.cons.jacobian()
         L_int = self.curr['L'] @ B_cons @ Binv_int
-        D_int = np.einsum('i,ijk->jk', L_int, self.int.hessian())
+        D_int = _contract(L_int, jacs['D'])
         Hc = Binv_int.T @ (D_cons - D_int) @ Binv_int
         return Hc
 
     def get_drdx(self):
         # dr/dq = dr/dx dx/dq
-        return PES.get_drdx(self) @ np.linalg.pinv(self.int.jacobian())
+        return PES.get_drdx(self) @ self._jacs(pinv=True)['Binv']
 
     def _calc_basis(self):
         drdx = self.get_drdx()
-        Ucons = modified_gram_schmidt(drdx.T)
+        Ucons = _ortho(drdx.T)
         na = 3 * len(self.atoms)
-        B = self.int.jacobian()
-        Udummy = modified_gram_schmidt(B[:, na:])
-        Binv = np.linalg.pinv(B)
-        Unred = modified_gram_schmidt(B @ Binv, Udummy)
+        jacs = self._jacs(pinv=True)
+        B = jacs['B']
+        Udummy = _ortho(B[:, na:])
+        # B @ Binv is a singular projector and Ufree loses rank to the
+        # constraints, so both take the pruning Gram-Schmidt sweep
+        # directly rather than a QR that is bound to be rejected
+        Unred = modified_gram_schmidt(B @ jacs['Binv'], Udummy)
         Ufree = modified_gram_schmidt(Unred, Ucons)
         return drdx, Ucons, Unred, Ufree
 
     def eval(self):
         f, g_cart = PES.eval(self)
-        Binv = np.linalg.pinv(self.int.jacobian())
+        Binv = self._jacs(pinv=True)['Binv']
         return f, g_cart @ Binv[:len(g_cart)]
 
     def update_internals(self, dx):
@@ -469,11 +634,13 @@ class InternalPES(PES):
         new_int.find_all_dihedrals()
         new_cons = new_int.cons
 
-        # Calculate B matrix and its inverse for new and old internals
-        Blast = self.int.jacobian()
+        # Reuse the cached Jacobians of the outgoing internal coordinate
+        # set and compute those of the new one exactly once
+        jacs = self._jacs(hessian=True)
+        Blast = jacs['B']
+        Dlast = jacs['D']
         B = new_int.jacobian()
         Binv = np.linalg.pinv(B)
-        Dlast = self.int.hessian()
         D = new_int.hessian()
 
         # # Projection matrices
@@ -483,27 +650,32 @@ class InternalPES(PES):
         x = new_int.calc()
         g = -self.atoms.get_forces().ravel() @ Binv[:3*len(self.atoms)]
         drdx = new_cons.jacobian() @ Binv
-        L = np.linalg.lstsq(drdx.T, g, rcond=None)[0]
-        Ucons = modified_gram_schmidt(drdx.T)
+        L = _lsq(drdx.T, g)
+        Ucons = _ortho(drdx.T)
+        # B @ B.T is rank deficient for redundant internals, and Ufree
+        # loses rank to the constraints: skip the doomed QR attempt
         Unred = modified_gram_schmidt(B @ B.T)
         Ufree = modified_gram_schmidt(Unred, Ucons)
 
         # Update H using old data where possible. For new (dummy) atoms,
         # use the guess hessian info.
-        H = self.get_H().asarray()
-        Hcart = Blast.T @ H @ Blast
-        Hcart += np.einsum('i,ijk->jk', self.curr['g'], Dlast)
+        Hcart = Blast.T @ self.get_H().dot(Blast)
+        Hcart += _contract(self.curr['g'], Dlast)
         Hnew = Binv.T[:, :nold] @ (
-            Hcart - np.einsum('i,ijk->jk', g, D)
+            Hcart - _contract(g, D)
         ) @ Binv
         self.dim = len(x)
         self.set_H(Hnew)
 
         self.int = new_int
         self.cons = new_cons
+        # Prime the cache so the getters below do not recompute the
+        # Jacobians of the new internal coordinate set
+        self._jac_cache = dict(key=self._jac_key(), B=B, Binv=Binv, D=D)
 
         self.curr.update(x=x, g=g, drdx=drdx, Ufree=Ufree,
-                         Unred=Unred, Ucons=Ucons, L=L, B=B, Binv=Binv)
+                         Unred=Unred, Ucons=Ucons, L=L, B=B, Binv=Binv,
+                         poskey=self._pos_key())
 
     def get_df_pred(self, dx, g, H):
         if H is None:
@@ -512,7 +684,7 @@ class InternalPES(PES):
         dx_r = dx @ Unred
         # dx_r = self.wrap_dx(dx) @ Unred
         g_r = g @ Unred
-        H_r = Unred.T @ H @ Unred
+        H_r = Unred.T @ H.dot(Unred)
         return g_r.T @ dx_r + (dx_r.T @ H_r @ dx_r) / 2.
 
     # FIXME: temporary functions for backwards compatibility
@@ -520,8 +692,8 @@ class InternalPES(PES):
         """Returns Nx3 array of atomic forces orthogonal to constraints."""
         g = self.get_g()
         Ufree = self.get_Ufree()
-        B = self.int.jacobian()
-        return -((Ufree @ Ufree.T) @ g @ B).reshape((-1, 3))
+        B = self._jacs()['B']
+        return -((Ufree @ (Ufree.T @ g)) @ B).reshape((-1, 3))
 
     def wrap_dx(self, dx):
         return self.int.wrap(dx)
@@ -532,19 +704,44 @@ class InternalPES(PES):
         nxd = 3 * len(self.dummies)
         x, dxdt, g = y.reshape((3, nxa + nxd))
 
-        dydt = np.zeros((3, nxa + nxd))
-        dydt[0] = dxdt
-
-        self.atoms.positions = x[:nxa].reshape((-1, 3)).copy()
-        self.dummies.positions = x[nxa:].reshape((-1, 3)).copy()
-
-        D = self.int.hessian()
-        Binv = np.linalg.pinv(self.int.jacobian())
-        D_tmp = -np.einsum('ij,jkl,k->il', Binv, D, dxdt)
-        dydt[1] = D_tmp @ dxdt
-        dydt[2] = D_tmp @ g
-
-        return dydt.ravel()
+        # The positions setter copies into the existing array, so no
+        # defensive copy of the slice is needed
+        self.atoms.positions = x[:nxa].reshape((-1, 3))
+        self.dummies.positions = x[nxa:].reshape((-1, 3))
+
+        jacs = self._jacs(pinv=True, hessian=True)
+        return _q_ode_core(dxdt, g, jacs['Binv'], jacs['D'])
+
+    def _q_jac(self, t, y):
+        """Jacobian of _q_ode with respect to y for LSODA's stiff
+        corrector. The blocks involving dxdt and g follow directly from
+        the Jacobian and Hessian already cached for the right-hand side;
+        the dependence on x would require third derivatives of the
+        internal coordinates and is omitted. The corrector iteration
+        only uses this matrix as a preconditioner, so the approximation
+        affects step-size control rather than the accuracy of the
+        solution."""
+        nxa = 3 * len(self.atoms)
+        nxd = 3 * len(self.dummies)
+        nx = nxa + nxd
+        x, dxdt, g = y.reshape((3, nx))
+
+        self.atoms.positions = x[:nxa].reshape((-1, 3))
+        self.dummies.positions = x[nxa:].reshape((-1, 3))
+
+        jacs = self._jacs(pinv=True, hessian=True)
+        D = jacs['D']
+        Binv = jacs['Binv']
+        D_tmp = Binv @ np.tensordot(D, dxdt, axes=(1, 0))
+
+        jac = np.zeros((3 * nx, 3 * nx))
+        jac[:nx, nx:2 * nx] = np.eye(nx)
+        # D is symmetric in its trailing axes, so d(dydt[1])/d(dxdt)
+        # contracts D with dxdt twice
+        jac[nx:2 * nx, nx:2 * nx] = -2. * D_tmp
+        jac[2 * nx:, nx:2 * nx] = -Binv @ np.tensordot(D, g, axes=(2, 0))
+        jac[2 * nx:, 2 * nx:] = -D_tmp
+        return jac
 
     def kick(self, dx, diag=False, **diag_kwargs):
         ratio = PES.kick(self, dx, diag=diag, **diag_kwargs)
@@ -569,7 +766,6 @@ class InternalPES(PES):
         if not PES._update(self, feval=feval):
             return
 
-        B = self.int.jacobian()
-        Binv = np.linalg.pinv(B)
-        self.curr.update(B=B, Binv=Binv)
+        jacs = self._jacs(pinv=True)
+        self.curr.update(B=jacs['B'], Binv=jacs['Binv'])
         return True
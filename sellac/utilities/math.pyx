@@ -1,6 +1,7 @@
 from libc.math cimport sqrt, fabs, INFINITY
 from libc.string cimport memset
-from scipy.linalg.cython_blas cimport daxpy, dnrm2, dcopy, dgemv, ddot, dger
+from scipy.linalg.cython_blas cimport (daxpy, dnrm2, dcopy, dgemv, ddot,
+                                       dger, dscal)
 from scipy.linalg.cython_lapack cimport dgesvd
 
 import numpy as np
@@ -16,9 +17,8 @@ cdef inline int normalize(double[:] x) nogil:
     cdef int n = len(x)
     cdef int sdx = x.strides[0] >> 3
     cdef double norm = dnrm2(&n, &x[0], &sdx)
-    cdef int i
-    for i in range(n):
-        x[i] /= norm
+    cdef double inorm = 1. / norm
+    dscal(&n, &inorm, &x[0], &sdx)
     return 0
 
 
@@ -91,6 +91,10 @@ cdef int mgs(double[:, :] X, double[:, :] Y=None, double eps1=1e-15,
         ny = Y.shape[1]
         sdy = Y.strides[0] >> 3
 
+    # The column rescalings below deliberately divide element-wise
+    # rather than multiplying by a precomputed reciprocal (e.g. with
+    # dscal): the rounding difference is enough to perturb downstream
+    # optimization trajectories.
     cdef double norm, normtot, dot
 
     # Now orthonormalize X
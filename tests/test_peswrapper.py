@@ -5,6 +5,7 @@ import numpy as np
 from ase.build import molecule
 from ase.calculators.emt import EMT
 
+from sella.internal import Internals
 from sella.peswrapper import PES, InternalPES
 
 @pytest.mark.parametrize("name,traj,cons",
@@ -36,3 +37,34 @@ def test_PES(name, traj, cons):
         np.testing.assert_allclose(A, 0, **tol)
 
         pes.kick(-pes.get_g() * 0.001, diag=True, gamma=0.1)
+
+
+def test_no_constraints():
+    # With an empty constraint set, the constraint Hessian must come
+    # out as a zero matrix rather than crash on the zero-size
+    # contraction in get_Hc.
+    atoms = molecule("CH4")
+    atoms.calc = EMT()
+    pes = InternalPES(atoms, internals=Internals(atoms))
+
+    pes.get_g()
+    np.testing.assert_allclose(pes.get_Hc(), 0, atol=1e-10)
+
+    pes.kick(-pes.get_g() * 0.01, diag=True, gamma=0.1)
+
+
+def test_external_position_change():
+    # The getters must notice positions changed directly on the Atoms
+    # object, not only moves made through set_x.
+    atoms = molecule("CH4")
+    atoms.calc = EMT()
+    for pes in [PES(atoms), InternalPES(atoms, internals=Internals(atoms))]:
+        f0 = pes.get_f()
+        g0 = pes.get_g()
+
+        atoms.positions[0, 0] += 0.1
+        assert pes.get_f() != f0
+        assert not np.allclose(pes.get_g(), g0)
+
+        atoms.positions[0, 0] -= 0.1
+        assert pes.get_f() == pytest.approx(f0)